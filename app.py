@@ -1,17 +1,135 @@
-from flask import Flask, render_template, request, jsonify
+import os
+
+# Cooperative I/O for gevent servers; must patch before anything else is imported
+if os.getenv('USE_GEVENT'):
+    from gevent import monkey
+    monkey.patch_all()
+
+from flask import Flask, render_template, request
+import orjson
 import praw
+import requests
+from requests.adapters import HTTPAdapter
 import pandas as pd
+import numpy as np
 from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
-from datetime import datetime
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain, islice
+from cachetools import TTLCache
+import threading
+import functools
+import codecs
+import string
 import configparser
-import os
 import re
 
 app = Flask(__name__)
 
+# Patterns used by preprocess_text, compiled once at import. URLs and
+# subreddit and user mentions are dropped in a single scan of the text.
+# Mentions stop short of an embedded URL so the URL is still stripped whole.
+_MENTIONS_AND_URLS_RE = re.compile(
+    r'http\S+|www\S+'
+    r'|r/(?:(?!http\S|www\S)\w)+'
+    r'|u/(?:(?!http\S|www\S|r/\w)\w)+',
+    flags=re.UNICODE)
+_WHITESPACE_RE = re.compile(r'\s+')
+# Short text made only of allowed ASCII characters and no URL needs no cleanup
+_SIMPLE_TEXT_RE = re.compile(r"(?:(?!http\S|www\S)[a-zA-Z0-9 \t\n\r\f\v.,!?'$%-])*\Z")
+
+# Disallowed ASCII characters are replaced with a space via str.translate
+_ALLOWED_ASCII = frozenset(string.ascii_letters + string.digits + string.whitespace + ".,!?'-$%")
+_DISALLOWED_ASCII_TABLE = {i: ' ' for i in range(128) if chr(i) not in _ALLOWED_ASCII}
+
+# Code point ranges treated as emojis and removed from the text
+_EMOJI_RANGES = (
+    (0x1F600, 0x1F64F),
+    (0x1F300, 0x1F5FF),
+    (0x1F680, 0x1F6FF),
+    (0x1F1E0, 0x1F1FF),
+    (0x02702, 0x027B0),
+    (0x024C2, 0x1F251),
+    (0x1F900, 0x1F9FF),
+    (0x1FA00, 0x1FA6F),
+    (0x02600, 0x026FF),
+    (0x02700, 0x027BF),
+)
+
+
+class _NonAsciiTable(dict):
+    """str.translate table deleting emojis and mapping other code points to a space.
+    
+    Entries are filled in per code point on first use, since the emoji ranges
+    alone span over 100k code points.
+    """
+    
+    def __missing__(self, codepoint):
+        value = None if any(low <= codepoint <= high for low, high in _EMOJI_RANGES) else ' '
+        self[codepoint] = value
+        return value
+
+
+_NON_ASCII_TABLE = _NonAsciiTable()
+
+
+def _replace_non_ascii(error):
+    """Encoding error handler used by preprocess_text for each run of non-ASCII text."""
+    return error.object[error.start:error.end].translate(_NON_ASCII_TABLE), error.end
+
+
+# Namespaced, since codec error handlers are registered process-wide
+_NON_ASCII_ERRORS = 'vader_app.preprocess_text'
+codecs.register_error(_NON_ASCII_ERRORS, _replace_non_ascii)
+
+
+# Company names searched alongside their tickers, and the reverse lookup.
+# The first ticker listed for a name wins (GOOGL over GOOG).
+TICKER_TO_NAME = {
+    'TSLA': 'Tesla', 'AAPL': 'Apple', 'GME': 'GameStop',
+    'AMC': 'AMC', 'NVDA': 'Nvidia', 'MSFT': 'Microsoft',
+    'GOOGL': 'Google', 'GOOG': 'Google', 'AMZN': 'Amazon',
+    'META': 'Meta', 'NFLX': 'Netflix', 'AMD': 'AMD',
+    'PLTR': 'Palantir', 'BB': 'BlackBerry', 'NOK': 'Nokia',
+    'SPCE': 'Virgin Galactic', 'NIO': 'NIO', 'COIN': 'Coinbase',
+}
+NAME_TO_TICKER = {name.lower(): ticker for ticker, name in reversed(TICKER_TO_NAME.items())}
+
+
+@functools.lru_cache(maxsize=256)
+def _stock_variations(stock_query):
+    """Search terms for a stock query, as a tuple so results can be cached."""
+    name = TICKER_TO_NAME.get(stock_query.upper())
+    if name:
+        return (stock_query, name)
+    
+    ticker = NAME_TO_TICKER.get(stock_query.lower())
+    if ticker:
+        return (stock_query, ticker)
+    
+    return (stock_query,)
+
+
+_sentiment_analyzer = None
+
+
+def get_sentiment_analyzer():
+    """Return the shared VADER analyzer, loading its lexicon on first use."""
+    global _sentiment_analyzer
+    if _sentiment_analyzer is None:
+        _sentiment_analyzer = SentimentIntensityAnalyzer()
+    return _sentiment_analyzer
+
+
+@functools.lru_cache(maxsize=4096)
+def _polarity_scores(text):
+    """VADER scores for cleaned text, memoized since reposts share their text."""
+    return get_sentiment_analyzer().polarity_scores(text)
+
+
 class RedditStockSentiment:
     def __init__(self, config_file='secrets.ini'):
-        """Initialize Reddit API connection and VADER sentiment analyzer."""
+        """Initialize Reddit API connection; VADER is loaded on first use."""
         
         # Try to get credentials from environment variables first (for deployment)
         client_id = os.getenv('REDDIT_CLIENT_ID')
@@ -35,64 +153,68 @@ class RedditStockSentiment:
                 client_secret = config.get('reddit', 'client_secret')
                 user_agent = config.get('reddit', 'user_agent')
         
+        # Pooled keep-alive session so concurrent searches reuse TLS connections
+        http_session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=16, pool_maxsize=32, max_retries=2)
+        http_session.mount('https://', adapter)
+        http_session.mount('http://', adapter)
+        
         self.reddit = praw.Reddit(
             client_id=client_id,
             client_secret=client_secret,
-            user_agent=user_agent
+            user_agent=user_agent,
+            requestor_kwargs={'session': http_session}
         )
-        self.analyzer = SentimentIntensityAnalyzer()
+        
+        # Recent results per (subreddit, stock), so repeated queries skip Reddit
+        self._results_cache = TTLCache(maxsize=512, ttl=300)
+        self._results_cache_lock = threading.Lock()
+    
+    @property
+    def analyzer(self):
+        """Shared VADER analyzer, loaded on first access."""
+        return get_sentiment_analyzer()
     
     def preprocess_text(self, text):
         """Clean and preprocess text for sentiment analysis."""
-        if not text or text.strip() == '':
+        if not text or text.isspace():
             return ''
         
-        text = re.sub(r'http\S+|www\S+|https\S+', '', text, flags=re.MULTILINE)
-        text = re.sub(r'r/\w+', '', text)
-        text = re.sub(r'u/\w+', '', text)
-        
-        emoji_pattern = re.compile("["
-            u"\U0001F600-\U0001F64F"
-            u"\U0001F300-\U0001F5FF"
-            u"\U0001F680-\U0001F6FF"
-            u"\U0001F1E0-\U0001F1FF"
-            u"\U00002702-\U000027B0"
-            u"\U000024C2-\U0001F251"
-            u"\U0001F900-\U0001F9FF"
-            u"\U0001FA00-\U0001FA6F"
-            u"\U00002600-\U000026FF"
-            u"\U00002700-\U000027BF"
-            "]+", flags=re.UNICODE)
-        text = emoji_pattern.sub(r'', text)
-        text = re.sub(r'[^a-zA-Z0-9\s.,!?\'\-$%]', ' ', text)
-        text = re.sub(r'\s+', ' ', text)
+        if len(text) < 32 and _SIMPLE_TEXT_RE.match(text):
+            return _WHITESPACE_RE.sub(' ', text).strip()
+        
+        text = _MENTIONS_AND_URLS_RE.sub('', text)
+        if not text.isascii():
+            # Emojis are dropped and any other non-ASCII character becomes a space
+            text = text.encode('ascii', _NON_ASCII_ERRORS).decode('ascii')
+        text = text.translate(_DISALLOWED_ASCII_TABLE)
+        text = _WHITESPACE_RE.sub(' ', text)
         text = text.strip()
         
         return text
     
     def get_stock_variations(self, stock_query):
         """Get different variations of stock query."""
-        ticker_to_name = {
-            'TSLA': 'Tesla', 'AAPL': 'Apple', 'GME': 'GameStop',
-            'AMC': 'AMC', 'NVDA': 'Nvidia', 'MSFT': 'Microsoft',
-            'GOOGL': 'Google', 'GOOG': 'Google', 'AMZN': 'Amazon',
-            'META': 'Meta', 'NFLX': 'Netflix', 'AMD': 'AMD',
-            'PLTR': 'Palantir', 'BB': 'BlackBerry', 'NOK': 'Nokia',
-            'SPCE': 'Virgin Galactic', 'NIO': 'NIO', 'COIN': 'Coinbase',
-        }
-        
-        query_upper = stock_query.upper()
-        search_terms = [stock_query]
-        
-        if query_upper in ticker_to_name:
-            search_terms.append(ticker_to_name[query_upper])
-        else:
-            for ticker, name in ticker_to_name.items():
-                if name.lower() == stock_query.lower():
-                    search_terms.append(ticker)
-                    break
+        return list(_stock_variations(stock_query))
+    
+    def _search_term(self, subreddit, term, limit, sort):
+        """Fetch posts for a single search term."""
+        search_params = {'limit': limit, 'sort': sort}
+        if sort == 'top':
+            search_params['time_filter'] = 'month'
         
-        return search_terms
+        return [
+            {
+                'title': submission.title,
+                'text': submission.selftext,
+                'score': submission.score,
+                'url': submission.url,
+                'created_utc': time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(submission.created_utc)),
+                'num_comments': submission.num_comments,
+                'post_id': submission.id
+            }
+            for submission in islice(subreddit.search(term, **search_params), limit)
+        ]
     
     def search_posts(self, subreddit_name, stock_query, limit=5, sort='new'):
         """Search for posts in subreddit."""
@@ -102,66 +224,77 @@ class RedditStockSentiment:
         
         search_terms = self.get_stock_variations(stock_query)
         
-        for term in search_terms:
-            search_params = {'limit': limit, 'sort': sort}
-            if sort == 'top':
-                search_params['time_filter'] = 'month'
-            
-            for submission in subreddit.search(term, **search_params):
-                if submission.id not in seen_ids:
-                    seen_ids.add(submission.id)
-                    post_data = {
-                        'title': submission.title,
-                        'text': submission.selftext,
-                        'score': submission.score,
-                        'url': submission.url,
-                        'created_utc': datetime.fromtimestamp(submission.created_utc).strftime('%Y-%m-%d %H:%M:%S'),
-                        'num_comments': submission.num_comments,
-                        'post_id': submission.id
-                    }
-                    posts.append(post_data)
-                    if len(posts) >= limit:
-                        break
-            if len(posts) >= limit:
-                break
-        
-        return posts[:limit]
+        # Terms are searched lazily, so a fallback term is only requested
+        # when the earlier ones come up short
+        term_results = (self._search_term(subreddit, term, limit, sort) for term in search_terms)
+        
+        for post_data in chain.from_iterable(term_results):
+            if post_data['post_id'] not in seen_ids:
+                seen_ids.add(post_data['post_id'])
+                posts.append(post_data)
+                if len(posts) >= limit:
+                    break
+        
+        return posts
     
     def analyze_sentiment(self, text):
         """Analyze sentiment using VADER."""
-        scores = self.analyzer.polarity_scores(text)
+        # Copy so callers can't modify the memoized result
+        scores = dict(_polarity_scores(text))
         return scores
     
     def analyze_stock_sentiment(self, subreddit_name, stock_query):
         """Main function to analyze stock sentiment."""
-        top_posts = self.search_posts(subreddit_name, stock_query, limit=5, sort='top')
-        new_posts = self.search_posts(subreddit_name, stock_query, limit=5, sort='new')
+        cache_key = (subreddit_name, stock_query)
+        with self._results_cache_lock:
+            cached = self._results_cache.get(cache_key)
+        if cached is not None:
+            return cached
         
-        all_posts = top_posts + new_posts
-        seen_ids = set()
-        unique_posts = []
-        for post in all_posts:
-            if post['post_id'] not in seen_ids:
-                seen_ids.add(post['post_id'])
-                unique_posts.append(post)
+        # Both searches share the PRAW client, which is not documented as
+        # thread-safe; it is already shared across request threads and only
+        # serves read-only listings here
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            top_future = executor.submit(self.search_posts, subreddit_name, stock_query, limit=5, sort='top')
+            new_future = executor.submit(self.search_posts, subreddit_name, stock_query, limit=5, sort='new')
+            top_posts = top_future.result()
+            new_posts = new_future.result()
+        
+        unique_posts = {}
+        for post in chain(top_posts, new_posts):
+            unique_posts.setdefault(post['post_id'], post)
+        
+        # Title and body are cleaned and scored separately; link posts have no
+        # body, so only the title goes through preprocessing
+        cleaned_posts = []
+        for post in unique_posts.values():
+            parts = [self.preprocess_text(post['title'])]
+            if post['text']:
+                parts.append(self.preprocess_text(post['text']))
+            parts = [part for part in parts if part]
+            if parts:
+                cleaned_posts.append((post, parts))
+        
+        # Combine the parts' compound scores weighted by their length. The
+        # memoized scores are only read here, so they are not copied.
+        score = _polarity_scores
+        scores = [
+            sum(score(part)['compound'] * len(part) for part in parts) / sum(map(len, parts))
+            for _, parts in cleaned_posts
+        ]
         
         results = []
-        for post in unique_posts:
-            full_text = f"{post['title']} {post['text']}"
-            cleaned_text = self.preprocess_text(full_text)
-            
-            if not cleaned_text:
-                continue
-            
-            sentiment = self.analyze_sentiment(cleaned_text)
-            
-            result = {
+        for (post, parts), score in zip(cleaned_posts, scores):
+            cleaned_text = ' '.join(parts)
+            results.append({
                 'timestamp': post['created_utc'],
                 'post': cleaned_text[:300] + '...' if len(cleaned_text) > 300 else cleaned_text,
-                'sentiment_score': round(sentiment['compound'], 3),
+                'sentiment_score': round(score, 3),
                 'url': post['url']
-            }
-            results.append(result)
+            })
+        
+        with self._results_cache_lock:
+            self._results_cache[cache_key] = results
         
         return results
 
@@ -181,6 +314,10 @@ SUBREDDITS = [
     'Daytrading', 'SecurityAnalysis'
 ]
 
+def json_response(obj, status=200):
+    """Build a JSON response serialized with orjson."""
+    return app.response_class(orjson.dumps(obj), status=status, mimetype='application/json')
+
 @app.route('/')
 def index():
     """Render the main page."""
@@ -195,32 +332,34 @@ def analyze():
         subreddit = data.get('subreddit')
         
         if not stock or not subreddit:
-            return jsonify({'error': 'Please select both stock and subreddit'}), 400
+            return json_response({'error': 'Please select both stock and subreddit'}, 400)
         
         results = analyzer.analyze_stock_sentiment(subreddit, stock)
         
         if not results:
-            return jsonify({'error': 'No posts found for this stock'}), 404
+            return json_response({'error': 'No posts found for this stock'}, 404)
         
         # Calculate summary statistics
-        scores = [r['sentiment_score'] for r in results]
+        scores = np.fromiter((r['sentiment_score'] for r in results), dtype=np.float64, count=len(results))
+        positive_posts = int((scores >= 0.05).sum())
+        negative_posts = int((scores <= -0.05).sum())
         summary = {
             'total_posts': len(results),
-            'avg_sentiment': round(sum(scores) / len(scores), 3),
-            'max_sentiment': round(max(scores), 3),
-            'min_sentiment': round(min(scores), 3),
-            'positive_posts': len([s for s in scores if s >= 0.05]),
-            'negative_posts': len([s for s in scores if s <= -0.05]),
-            'neutral_posts': len([s for s in scores if -0.05 < s < 0.05])
+            'avg_sentiment': round(float(scores.mean()), 3),
+            'max_sentiment': round(float(scores.max()), 3),
+            'min_sentiment': round(float(scores.min()), 3),
+            'positive_posts': positive_posts,
+            'negative_posts': negative_posts,
+            'neutral_posts': len(results) - positive_posts - negative_posts
         }
         
-        return jsonify({
+        return json_response({
             'results': results,
             'summary': summary
         })
     
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return json_response({'error': str(e)}, 500)
 
 if __name__ == '__main__':
     # Get port from environment variable (for deployment) or use 5000 (for local)